@@ -4,7 +4,7 @@ Calcola le feature comuni a TUTTI i modelli nei 3 scenari, per ciascun Group.
 
 Struttura attesa (default: "Selected features"):
 Selected features/
-  All groups/
+  All Groups/
     Normal only/
       Logistic Regression/selected_features.txt
       MLP/selected_features.txt
@@ -18,7 +18,7 @@ Selected features/
 
 Output:
 common_features/
-  All groups/
+  All Groups/
     common_Normal only.txt
     common_Normal New only.txt
     common_Merged Normal.txt
@@ -32,13 +32,21 @@ Uso:
 Opzioni:
     --normalize-case    Normalizza le feature in lower-case per l'intersezione
     --strip-punct       Rimuove punteggiatura semplice (.,;:!-?) dai nomi feature prima dell'intersezione
+    --no-cache          Non usa la cache .features_cache.json in --out-dir
 """
 
 from __future__ import annotations
 import argparse
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, Set, Dict, List
+from typing import AbstractSet, Iterable, Iterator, Set, Dict, FrozenSet, List, Optional, Tuple
 import string
+import sys
+
+from feature_cache import FeatureCache
+from feature_files import MAX_WORKERS, FeatureKey, decode_lines, scan_feature_files
 
 # Config nominativi (sinistra: nome cartella, destra: etichetta visuale)
 GROUPS = [
@@ -60,54 +68,157 @@ MODELS = [
     "XGBoost",
 ]
 
+# Cache JSON (dentro --out-dir) dei set normalizzati, invalidata dall'mtime di ogni file
+CACHE_FILE = ".features_cache.json"
+
+# (trovato, feature) per un modello
+LoadResult = Tuple[bool, Set[str]]
+# Come LoadResult, ma None se la lettura è stata saltata
+MaybeLoaded = Optional[LoadResult]
+
+# Punteggiatura rimossa da --strip-punct: tabella per str.translate (file non ASCII)
+# e byte da cancellare con bytes.translate (file ASCII, il caso normale)
+_PUNCT_CHARS = ".,;:!?-"
+_PUNCT_TABLE = str.maketrans("", "", _PUNCT_CHARS)
+_PUNCT_BYTES = _PUNCT_CHARS.encode("ascii")
+
+# Spazi ASCII tolti da str.strip(): bytes.strip() da solo non toglie \x1c-\x1f
+_ASCII_WS = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+
+
+def _iter_normalized_ascii(data: bytes, lower: bool, strip_punct: bool) -> Iterator[str]:
+    # Normalizza direttamente sui bytes; decodifica solo la feature finale
+    for line in data.splitlines():
+        y = line.strip(_ASCII_WS)
+        if not y:
+            continue
+        if strip_punct:
+            y = y.translate(None, _PUNCT_BYTES)
+        if lower:
+            y = y.lower()
+        y = y.strip(_ASCII_WS)
+        if y:
+            yield sys.intern(y.decode("latin-1"))
+
 
-def load_features(txt: Path) -> List[str]:
-    if not txt.exists():
-        return []
-    out = []
-    with txt.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            s = line.strip()
-            if s:
-                out.append(s)
-    return out
-
-
-def normalize_items(items: Iterable[str], lower: bool, strip_punct: bool) -> List[str]:
-    if not lower and not strip_punct:
-        return list(items)
-    table = str.maketrans("", "", ".,;:!?-") if strip_punct else None
-    normed = []
-    for x in items:
-        y = x
+def _iter_normalized(lines: Iterable[str], lower: bool, strip_punct: bool) -> Iterator[str]:
+    for line in lines:
+        y = line.strip()
+        if not y:
+            continue
         if strip_punct:
-            y = y.translate(table)
+            y = y.translate(_PUNCT_TABLE)
         if lower:
             y = y.lower()
         y = y.strip()
         if y:
-            normed.append(y)
-    return normed
+            yield sys.intern(y)
+
 
+def load_feature_set(
+    txt: str,
+    lower: bool,
+    strip_punct: bool,
+    cache: Optional[FeatureCache] = None,
+    mtime_ns: Optional[int] = None,
+) -> LoadResult:
+    """Legge, normalizza e deduplica le feature di un file in un solo passaggio.
 
-def intersect_many(sets: Iterable[Set[str]]) -> Set[str]:
-    it = iter(sets)
+    Restituisce (trovato, feature): trovato è False se il file non esiste.
+    Le feature passano da sys.intern: lo stesso nome è lo stesso oggetto in tutti
+    i modelli, così l'intersezione confronta per identità.
+    La cache si usa solo insieme a mtime_ns: se coincide il file non viene riletto.
+    """
+    if mtime_ns is None:
+        cache = None
+    # La chiave include la normalizzazione: ogni combinazione di opzioni ha la sua voce
+    key = f"{os.path.abspath(txt)}|lower={int(lower)}|strip_punct={int(strip_punct)}"
+    if cache is not None:
+        items = cache.get(key, mtime_ns)
+        if items is not None:
+            return True, set(map(sys.intern, items))
     try:
-        acc = set(next(it))
-    except StopIteration:
+        with open(txt, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return False, set()
+    if data.isascii():
+        feats = set(_iter_normalized_ascii(data, lower, strip_punct))
+    else:
+        feats = set(_iter_normalized(decode_lines(data), lower, strip_punct))
+    if cache is not None:
+        cache.put(key, mtime_ns, sorted(feats))
+    return True, feats
+
+
+def intersect_many(sets: Iterable[AbstractSet[str]]) -> Set[str]:
+    """Intersezione di set o frozenset: copia solo il più piccolo, gli input non vengono modificati."""
+    # Parte dal set più piccolo: l'accumulatore resta minimo fin da subito
+    ordered = sorted(sets, key=len)
+    if not ordered:
         return set()
-    for s in it:
-        acc &= s
+    acc = set(ordered[0])
+    for s in ordered[1:]:
+        # acc non supera mai il set corrente: intersection_update itera già il lato più piccolo
+        acc.intersection_update(s)
         if not acc:
             break
     return acc
 
 
+def stat_feature_files(paths: Dict[FeatureKey, str]) -> Dict[FeatureKey, Optional[os.stat_result]]:
+    stats: Dict[FeatureKey, Optional[os.stat_result]] = {}
+    for key, txt in paths.items():
+        try:
+            stats[key] = os.stat(txt)
+        except FileNotFoundError:
+            stats[key] = None
+    return stats
+
+
+def load_all(
+    paths: Dict[FeatureKey, str],
+    stats: Dict[FeatureKey, Optional[os.stat_result]],
+    lower: bool,
+    strip_punct: bool,
+    cache: Optional[FeatureCache] = None,
+) -> Dict[FeatureKey, MaybeLoaded]:
+    """Carica in parallelo i file di tutti gli scenari, saltando quelli già vuoti.
+
+    Basta un modello mancante o da 0 byte perché l'intersezione dello scenario sia
+    vuota: lo dicono già gli stat, quindi per quello scenario non si legge nulla e
+    gli altri modelli restano None. La scelta dipende solo dagli stat, non dai tempi
+    dei thread: stessi file, stesso risultato.
+    """
+    results: Dict[FeatureKey, MaybeLoaded] = {}
+    to_read: List[FeatureKey] = []
+    for g_folder, _ in GROUPS:
+        for s_folder, _ in SCENARIOS:
+            keys = [(g_folder, s_folder, model) for model in MODELS]
+            scenario_stats = [stats.get(key) for key in keys]
+            if not any(st is None or st.st_size == 0 for st in scenario_stats):
+                to_read.extend(keys)
+                continue
+            for key, st in zip(keys, scenario_stats):
+                if st is None:
+                    results[key] = (False, set())
+                elif st.st_size == 0:
+                    results[key] = (True, set())
+                else:
+                    results[key] = None
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        loaded = pool.map(
+            lambda key: load_feature_set(paths[key], lower, strip_punct, cache, stats[key].st_mtime_ns),
+            to_read,
+        )
+        results.update(zip(to_read, loaded))
+    return results
+
+
 def write_list(path: Path, items: Iterable[str]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        for x in sorted(items):
-            f.write(f"{x}\n")
+    lines = sorted(items)
+    path.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
 
 
 def main():
@@ -116,6 +227,7 @@ def main():
     ap.add_argument("--out-dir", type=Path, default=Path("common_features"), help="Cartella di output per i file risultanti")
     ap.add_argument("--normalize-case", action="store_true", help="Converte le feature in minuscolo per il calcolo dell'intersezione")
     ap.add_argument("--strip-punct", action="store_true", help="Rimuove punteggiatura semplice (.,;:!?-) prima dell'intersezione")
+    ap.add_argument("--no-cache", action="store_true", help=f"Non legge né scrive {CACHE_FILE} in --out-dir")
     args = ap.parse_args()
 
     base = args.base_dir
@@ -128,24 +240,39 @@ def main():
     print(f"Normalizzazione: lower={args.normalize_case}, strip_punct={args.strip_punct}")
     print()
 
+    # Carica in parallelo tutti i file: (group, scenario, modello) -> set di feature
+    paths = scan_feature_files(base, (g for g, _ in GROUPS), (s for s, _ in SCENARIOS), MODELS)
+    stats = stat_feature_files(paths)
+    # I file con mtime invariato dall'ultima esecuzione non vengono riletti
+    cache = None if args.no_cache else FeatureCache(args.out_dir / CACHE_FILE)
+    feature_sets = load_all(paths, stats, args.normalize_case, args.strip_punct, cache)
+    if cache is not None:
+        cache.save()
+
     for g_folder, g_label in GROUPS:
         print(f"=== GROUP: {g_label} ===")
-        per_scenario_common: Dict[str, Set[str]] = {}
+        per_scenario_common: Dict[str, FrozenSet[str]] = {}
 
         for s_folder, s_label in SCENARIOS:
             # Colleziona i set per i 5 modelli dentro lo scenario
             model_sets: List[Set[str]] = []
+            sizes: List[str] = []
             missing_models = []
+            skipped_models = []
             for model in MODELS:
-                txt = base / g_folder / s_folder / model / "selected_features.txt"
-                feats = load_features(txt)
-                feats_norm = normalize_items(feats, args.normalize_case, args.strip_punct)
-                model_sets.append(set(feats_norm))
-                if not txt.exists():
+                loaded = feature_sets.get((g_folder, s_folder, model), (False, set()))
+                if loaded is None:
+                    skipped_models.append(model)
+                    sizes.append("?")
+                    continue
+                found, feats = loaded
+                model_sets.append(feats)
+                sizes.append(str(len(feats)))
+                if not found:
                     missing_models.append(model)
 
             common_in_scenario = intersect_many(model_sets)
-            per_scenario_common[s_folder] = common_in_scenario
+            per_scenario_common[s_folder] = frozenset(common_in_scenario)
 
             # Scrivi file scenario
             out_file = args.out_dir / g_folder / f"common_{s_folder}.txt"
@@ -155,10 +282,11 @@ def main():
             print(f"  Modelli: {', '.join(MODELS)}")
             if missing_models:
                 print(f"  ATTENZIONE: file mancanti per: {', '.join(missing_models)}")
-            sizes = [len(ms) for ms in model_sets]
-            print(f"  Sizes per modello: {sizes}  → Common: {len(common_in_scenario)}")
+            if skipped_models:
+                print(f"  Lettura saltata (scenario già vuoto) per: {', '.join(skipped_models)}")
+            print(f"  Sizes per modello: [{', '.join(sizes)}]  → Common: {len(common_in_scenario)}")
             if common_in_scenario:
-                preview = ", ".join(sorted(list(common_in_scenario))[:10])
+                preview = ", ".join(heapq.nsmallest(10, common_in_scenario))
                 print(f"  Esempi: {preview}")
             print()
 
@@ -169,7 +297,7 @@ def main():
 
         print(f"→ Common ACROSS ALL 3 SCENARIOS in '{g_label}': {len(across)}")
         if across:
-            preview = ", ".join(sorted(list(across))[:20])
+            preview = ", ".join(heapq.nsmallest(20, across))
             print(f"  Esempi: {preview}")
         print()
 
@@ -0,0 +1,63 @@
+"""
+Cache JSON su disco delle feature lette dai selected_features.txt.
+
+Ogni script usa un proprio file di cache accanto al suo output:
+chiave -> {"mtime": st_mtime_ns, "items": [...]}. Una voce vale finché
+l'mtime del file sorgente coincide.
+
+Nessuna dipendenza extra: solo standard library.
+"""
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+
+
+class FeatureCache:
+    """Cache chiave -> (mtime, items) salvata in un file JSON.
+
+    save() riscrive il file solo se qualcosa è cambiato e tiene soltanto le voci
+    usate nell'esecuzione corrente, così il file non cresce con percorsi vecchi.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.dirty = False
+        self.used: set[str] = set()
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        self.entries: dict[str, dict] = entries if isinstance(entries, dict) else {}
+
+    def get(self, key: str, mtime_ns: int) -> list[str] | None:
+        self.used.add(key)
+        entry = self.entries.get(key)
+        if not isinstance(entry, dict) or entry.get("mtime") != mtime_ns:
+            return None
+        # Un file modificato a mano o corrotto vale come voce assente
+        items = entry.get("items")
+        if not isinstance(items, list) or not all(isinstance(x, str) for x in items):
+            return None
+        return items
+
+    def put(self, key: str, mtime_ns: int, items: list[str]) -> None:
+        self.used.add(key)
+        self.entries[key] = {"mtime": mtime_ns, "items": items}
+        self.dirty = True
+
+    def save(self) -> None:
+        stale = self.entries.keys() - self.used
+        if stale:
+            for key in stale:
+                del self.entries[key]
+            self.dirty = True
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -0,0 +1,64 @@
+"""
+Ricerca e lettura dei selected_features.txt, comuni a compute_common_features.py
+e generate_site.py.
+
+Struttura attesa: <base>/<group>/<scenario>/<modello>/selected_features.txt
+
+Nessuna dipendenza extra: solo standard library.
+"""
+from __future__ import annotations
+import os
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Tuple
+
+# Thread per la lettura parallela dei file selected_features.txt
+MAX_WORKERS = 8
+
+FeatureKey = Tuple[str, str, str]
+
+
+def _subdirs(path: str, allowed: dict[str, str]) -> Iterator[tuple[str, str]]:
+    # allowed: nome casefold -> nome configurato. Il confronto ignora maiuscole/minuscole
+    # su ogni filesystem (anche Linux); se esistono entrambe le grafie vince quella esatta.
+    found: dict[str, str] = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            name = allowed.get(entry.name.casefold())
+            if name is not None and entry.is_dir() and (name not in found or entry.name == name):
+                found[name] = entry.path
+    return iter(found.items())
+
+
+def scan_feature_files(
+    base: Path,
+    groups: Iterable[str],
+    scenarios: Iterable[str],
+    models: Iterable[str],
+) -> dict[FeatureKey, str]:
+    """Percorre group/scenario/modello con os.scandir, limitandosi ai nomi configurati.
+
+    Restituisce (group, scenario, modello) -> percorso del selected_features.txt;
+    le cartelle assenti semplicemente non compaiono.
+    """
+    group_names = {g.casefold(): g for g in groups}
+    scenario_names = {s.casefold(): s for s in scenarios}
+    model_names = {m.casefold(): m for m in models}
+    found: dict[FeatureKey, str] = {}
+    for g_name, g_path in _subdirs(os.fspath(base), group_names):
+        for s_name, s_path in _subdirs(g_path, scenario_names):
+            for m_name, m_path in _subdirs(s_path, model_names):
+                found[(g_name, s_name, m_name)] = os.path.join(m_path, "selected_features.txt")
+    return found
+
+
+def decode_lines(data: bytes) -> Iterator[str]:
+    """Divide il contenuto di un file in righe decodificate.
+
+    bytes.splitlines divide solo su \\n, \\r e \\r\\n, come la lettura in modalità testo
+    (str.splitlines spezzerebbe anche su \\x0b, \\x0c, \\x1c-\\x1e). I nomi delle feature
+    sono quasi sempre ASCII: latin-1 decodifica 1:1 senza gestore errori.
+    """
+    if data.isascii():
+        return (line.decode("latin-1") for line in data.splitlines())
+    return (line.decode("utf-8", "ignore") for line in data.splitlines())
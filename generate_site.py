@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 """
 Genera una pagina "index.html" con doppio livello di tab:
-- Tab superiori per Group ("All groups", "Pathologic And Control")
+- Tab superiori per Group ("All Groups", "Pathologic And Control")
 - Tab secondari per Scenario ("Normal only", "Normal New only", "Merged Normal")
 
 Dentro ogni scenario, una tabella a 5 colonne (una per modello) con le feature.
 
 Struttura attesa (di default nella cartella "Selected features"):
 Selected features/
-  All groups/
+  All Groups/
     Normal only/
       Logistic Regression/selected_features.txt
       MLP/selected_features.txt
@@ -28,13 +28,24 @@ Uso:
         --out index.html \
         --title "Selected Features Dashboard"
 
+Con --no-cache non viene letto né scritto .site_features_cache.json accanto all'output
+(utile quando la cartella di --out viene pubblicata così com'è).
+
 Nessuna dipendenza extra: solo standard library.
 """
 from __future__ import annotations
 import argparse
+import os
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache, partial
 import html
+from typing import Dict, List
+
+from feature_cache import FeatureCache
+from feature_files import MAX_WORKERS, FeatureKey, decode_lines, scan_feature_files
 
 GROUPS = [
     ("All Groups", "All Groups"),
@@ -57,88 +68,61 @@ MODELS = [
 
 DEFAULT_TITLE = "Selected Features Dashboard"
 
+# Etichette già escapate: sono costanti, inutile ripetere html.escape per ogni cella
+ESCAPED_GROUPS = tuple(html.escape(g_display) for _, g_display in GROUPS)
+ESCAPED_SCENARIOS = tuple(html.escape(sc_display) for _, sc_display in SCENARIOS)
+ESCAPED_MODELS = tuple(html.escape(m) for m in MODELS)
+
+# Feature per (group, scenario, modello); le combinazioni assenti non compaiono
+FeatureData = Dict[FeatureKey, List[str]]
+
+# Cache JSON (accanto a --out) delle feature lette, invalidata dall'mtime di ogni file
+CACHE_FILE = ".site_features_cache.json"
+
 
-def read_features(file_path: Path) -> list[str]:
+def read_features(file_path: str, cache: FeatureCache | None = None) -> list[str]:
     """Legge un selected_features.txt e restituisce una lista di feature (righe non vuote)."""
-    if not file_path.exists():
+    key = os.path.abspath(file_path)
+    try:
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        if cache is not None:
+            items = cache.get(key, mtime_ns)
+            if items is not None:
+                return items
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
         return []
-    lines: list[str] = []
-    with file_path.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            s = line.strip()
-            if s:
-                lines.append(s)
-    return lines
+    items = [s for line in decode_lines(data) if (s := line.strip())]
+    if cache is not None:
+        cache.put(key, mtime_ns, items)
+    return items
 
 
-def build_html(title: str, base_dir: Path, data: dict) -> str:
-    """Crea l'HTML completo con tab Group (1° livello) e Scenario (2° livello)."""
+@lru_cache(maxsize=4096)
+def escape_feature(feat: str) -> str:
+    """html.escape memoizzato: gli stessi nomi di feature ricorrono tra modelli e scenari."""
+    return html.escape(feat)
+
+
+def iter_html(title: str, base_dir: Path, data: FeatureData) -> Iterator[str]:
+    """Produce l'HTML con tab Group (1° livello) e Scenario (2° livello) come sequenza di frammenti."""
     generated_at = datetime.now().strftime("%Y-%m-%d %H:%M")
 
     def features_cell(features: list[str]) -> str:
         if not features:
             return '<div class="empty">—</div>'
-        items = "\n".join(f"<li>{html.escape(feat)}</li>" for feat in features)
-        return f"<ul>\n{items}\n</ul>"
+        # Un solo join in C al posto di un frammento per feature
+        return "<ul>\n<li>" + "</li>\n<li>".join(map(escape_feature, features)) + "</li>\n</ul>"
 
     # Nav gruppi (livello 1)
     groups_nav = "\n".join(
-        f'<button class="tab-link group-link" data-target="group-{i}">{html.escape(g_display)}</button>'
-        for i, (_, g_display) in enumerate(GROUPS)
+        f'<button class="tab-link group-link" data-target="group-{i}">{g_display}</button>'
+        for i, g_display in enumerate(ESCAPED_GROUPS)
     )
 
-    # Pannelli gruppo (ognuno con i propri tab scenario del livello 2)
-    group_sections = []
-    for gi, (g_folder, g_display) in enumerate(GROUPS):
-
-        # Nav scenari (livello 2) dentro il gruppo
-        scenarios_nav = "\n".join(
-            f'<button class="tab-link scenario-link" data-target="sc-{gi}-{si}">{html.escape(sc_display)}</button>'
-            for si, (_, sc_display) in enumerate(SCENARIOS)
-        )
-
-        # Sezioni scenario per questo gruppo
-        scenario_sections = []
-        for si, (sc_folder, sc_display) in enumerate(SCENARIOS):
-            # Tabella a 5 colonne (una per modello)
-            t_head = "".join(f"<th>{html.escape(m)}</th>" for m in MODELS)
-            t_cells = []
-            for m in MODELS:
-                feats = data.get(g_folder, {}).get(sc_folder, {}).get(m, [])
-                t_cells.append(f"<td>{features_cell(feats)}</td>")
-            t_row = "<tr>" + "".join(t_cells) + "</tr>"
-
-            # Badge conteggio feature per modello
-            counts = [len(data.get(g_folder, {}).get(sc_folder, {}).get(m, [])) for m in MODELS]
-            badges = "".join(
-                f'<div class="badge"><span class="label">{html.escape(m)}</span><span class="count">{c}</span></div>'
-                for m, c in zip(MODELS, counts)
-            )
-
-            scenario_sections.append(
-                f"""
-                <section id="sc-{gi}-{si}" class="tab-panel scenario-panel{' active' if (gi == 0 and si == 0) else ''}">
-                    <h3>{html.escape(sc_display)}</h3>
-                    <div class="badges">{badges}</div>
-                    <table class="features-table">
-                        <thead><tr>{t_head}</tr></thead>
-                        <tbody>{t_row}</tbody>
-                    </table>
-                </section>
-                """
-            )
-
-        group_sections.append(
-            f"""
-            <section id="group-{gi}" class="tab-panel group-panel{' active' if gi == 0 else ''}">
-                <h2>{html.escape(g_display)}</h2>
-                <nav class="tabs scenarios">{scenarios_nav}</nav>
-                {''.join(scenario_sections)}
-            </section>
-            """
-        )
-
-    sections_html = "\n".join(group_sections)
+    # Intestazione della tabella a 5 colonne (una per modello), uguale per ogni scenario
+    t_head = "".join(f"<th>{m}</th>" for m in ESCAPED_MODELS)
 
     # Per evitare conflitti tra { } del CSS/JS e f-string, raddoppiamo le graffe nel CSS.
     # Il JS è inserito come stringa normale all'interno dello script, quindi sicuro.
@@ -183,7 +167,7 @@ const gSafe = Number.isFinite(savedGroup) ? Math.max(0, Math.min(savedGroup, gro
 activateGroup(gSafe);
 """.strip()
 
-    return f"""
+    yield f"""
 <!DOCTYPE html>
 <html lang="it">
 <head>
@@ -255,7 +239,64 @@ activateGroup(gSafe);
       <nav class="tabs groups">{groups_nav}</nav>
     </div>
 
-    {sections_html}
+    """
+
+    # Pannelli gruppo (ognuno con i propri tab scenario del livello 2)
+    for gi, ((g_folder, _), g_display) in enumerate(zip(GROUPS, ESCAPED_GROUPS)):
+        if gi:
+            yield "\n"
+
+        # Nav scenari (livello 2) dentro il gruppo
+        scenarios_nav = "\n".join(
+            f'<button class="tab-link scenario-link" data-target="sc-{gi}-{si}">{sc_display}</button>'
+            for si, sc_display in enumerate(ESCAPED_SCENARIOS)
+        )
+
+        yield (
+            f"""
+            <section id="group-{gi}" class="tab-panel group-panel{' active' if gi == 0 else ''}">
+                <h2>{g_display}</h2>
+                <nav class="tabs scenarios">{scenarios_nav}</nav>
+                """
+        )
+
+        # Sezioni scenario per questo gruppo
+        for si, ((sc_folder, _), sc_display) in enumerate(zip(SCENARIOS, ESCAPED_SCENARIOS)):
+            # Badge conteggio feature per modello
+            model_feats = [data.get((g_folder, sc_folder, m), ()) for m in MODELS]
+            counts = [len(feats) for feats in model_feats]
+            badges = "".join(
+                f'<div class="badge"><span class="label">{m}</span><span class="count">{c}</span></div>'
+                for m, c in zip(ESCAPED_MODELS, counts)
+            )
+
+            yield (
+                f"""
+                <section id="sc-{gi}-{si}" class="tab-panel scenario-panel{' active' if (gi == 0 and si == 0) else ''}">
+                    <h3>{sc_display}</h3>
+                    <div class="badges">{badges}</div>
+                    <table class="features-table">
+                        <thead><tr>{t_head}</tr></thead>
+                        <tbody><tr>"""
+            )
+            for feats in model_feats:
+                yield "<td>"
+                yield features_cell(feats)
+                yield "</td>"
+            yield (
+                """</tr></tbody>
+                    </table>
+                </section>
+                """
+            )
+
+        yield (
+            """
+            </section>
+            """
+        )
+
+    yield f"""
 
     <footer>
       Static site — export HTML generato da script Python.
@@ -270,31 +311,39 @@ activateGroup(gSafe);
 """
 
 
+def build_html(title: str, base_dir: Path, data: FeatureData) -> str:
+    """Crea l'HTML completo come unica stringa."""
+    return "".join(iter_html(title, base_dir, data))
+
+
+def write_html(out_path: Path, title: str, base_dir: Path, data: FeatureData) -> None:
+    """Scrive l'HTML su disco man mano che viene generato, senza tenerlo tutto in memoria."""
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.writelines(iter_html(title, base_dir, data))
+
+
 def main():
     parser = argparse.ArgumentParser(description="Genera index.html con le feature selezionate")
     parser.add_argument("--base-dir", type=Path, default=Path("Selected features"), help="Cartella radice che contiene gruppi e scenari")
     parser.add_argument("--out", type=Path, default=Path("index.html"), help="Percorso del file HTML di output")
     parser.add_argument("--title", type=str, default=DEFAULT_TITLE, help="Titolo della pagina")
+    parser.add_argument("--no-cache", action="store_true", help=f"Non legge né scrive {CACHE_FILE} accanto all'output")
     args = parser.parse_args()
 
     base_dir: Path = args.base_dir
     if not base_dir.exists():
         raise SystemExit(f"Cartella non trovata: {base_dir}")
 
-    # Carica i dati: dict[group][scenario][modello] -> list[feature]
-    data: dict[str, dict[str, dict[str, list[str]]]] = {}
-    for g_folder, _ in GROUPS:
-        scen_map: dict[str, dict[str, list[str]]] = {}
-        for sc_folder, _ in SCENARIOS:
-            model_map: dict[str, list[str]] = {}
-            for model in MODELS:
-                file_path = base_dir / g_folder / sc_folder / model / "selected_features.txt"
-                model_map[model] = read_features(file_path)
-            scen_map[sc_folder] = model_map
-        data[g_folder] = scen_map
-
-    html_str = build_html(args.title, base_dir, data)
-    args.out.write_text(html_str, encoding="utf-8")
+    # Carica i dati: (group, scenario, modello) -> list[feature], leggendo i file in parallelo.
+    # I file con mtime invariato dall'ultima esecuzione non vengono riletti.
+    file_paths = scan_feature_files(base_dir, (g for g, _ in GROUPS), (sc for sc, _ in SCENARIOS), MODELS)
+    cache = None if args.no_cache else FeatureCache(args.out.parent / CACHE_FILE)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        data: FeatureData = dict(zip(file_paths, pool.map(partial(read_features, cache=cache), file_paths.values())))
+    if cache is not None:
+        cache.save()
+
+    write_html(args.out, args.title, base_dir, data)
     print(f"Creato: {args.out.resolve()}")
 
 